@@ -6,13 +6,15 @@ import json
 import hashlib
 import hmac
 from urllib.parse import parse_qs
-from database import db
+from database import get_db
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
+db = get_db()
+
 app = FastAPI()
 
 # CORS для работы с Telegram Mini App
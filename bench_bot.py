@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from sqlalchemy import event
+from fake_telegram import FakeTelegramAPI, FAKE_BOT_TOKEN, generate_updates
+
+# Нагрузочный тест bot.py против fake_telegram.py.
+# Прогоняет поток обновлений через настоящий polling и выводит
+# updates/sec, перцентили времени обработки и число SQL-запросов на update.
+# Обновления обрабатываются по одному (handle_as_tasks=False): обращения к БД
+# синхронные и блокируют цикл событий, поэтому при параллельной обработке
+# время обработчика включало бы ожидание остальных обновлений пачки.
+
+# Тип текущего обновления, чтобы считать SQL-запросы по типам
+current_kind = contextvars.ContextVar('current_kind', default='other')
+
+
+def update_kind(update):
+    """Определить тип обновления для статистики"""
+    message = update.message
+    if message is None:
+        return 'other'
+    if message.web_app_data:
+        return 'web_app_data'
+    if message.text and message.text.startswith('/start invite_'):
+        return 'invite'
+    if message.text and message.text.startswith('/start'):
+        return 'start'
+    return 'other'
+
+
+def percentile(values, p):
+    """Перцентиль по отсортированному списку"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Stats:
+    def __init__(self, total):
+        self.total = total
+        self.processed = 0
+        self.latencies = {}
+        self.db_calls = {}
+        self.done = asyncio.Event()
+
+    def count_db_call(self, *args):
+        kind = current_kind.get()
+        self.db_calls[kind] = self.db_calls.get(kind, 0) + 1
+
+    def add_latency(self, kind, seconds):
+        self.latencies.setdefault(kind, []).append(seconds)
+        self.processed += 1
+        if self.processed >= self.total:
+            self.done.set()
+
+    def report(self, elapsed):
+        rows = {}
+        for kind in sorted(self.latencies) + ['all']:
+            if kind == 'all':
+                values = sorted(v for vs in self.latencies.values() for v in vs)
+                calls = sum(self.db_calls.values())
+            else:
+                values = sorted(self.latencies[kind])
+                calls = self.db_calls.get(kind, 0)
+
+            rows[kind] = {
+                'updates': len(values),
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+                'max_ms': (values[-1] if values else 0.0) * 1000,
+                'db_calls_per_update': calls / len(values) if values else 0.0
+            }
+
+        return {
+            'updates': self.processed,
+            'elapsed_s': elapsed,
+            'updates_per_sec': self.processed / elapsed if elapsed else 0.0,
+            'by_kind': rows
+        }
+
+
+async def run_benchmark(args):
+    api = FakeTelegramAPI()
+    url = await api.start()
+
+    # bot.py читает настройки при импорте
+    os.environ['BOT_TOKEN'] = FAKE_BOT_TOKEN
+    os.environ['TELEGRAM_API_URL'] = url
+    os.environ['DATABASE_URL'] = args.database_url
+
+    import bot as bot_module
+    logging.getLogger('aiogram').setLevel(logging.WARNING)
+
+    stats = Stats(args.updates)
+    event.listen(bot_module.db.engine, 'before_cursor_execute', stats.count_db_call)
+
+    @bot_module.dp.update.outer_middleware()
+    async def measure(handler, event, data):
+        kind = update_kind(event)
+        current_kind.set(kind)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            stats.add_latency(kind, time.perf_counter() - started)
+
+    api.push_updates(generate_updates(
+        args.updates,
+        users=args.users,
+        invite_ratio=args.invite_ratio,
+        web_app_ratio=args.web_app_ratio,
+        seed=args.seed
+    ))
+
+    started = time.perf_counter()
+    timed_out = False
+    polling = asyncio.create_task(bot_module.dp.start_polling(
+        bot_module.bot,
+        handle_signals=False,
+        handle_as_tasks=False,
+        polling_timeout=1
+    ))
+    try:
+        await asyncio.wait_for(stats.done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        # Бот завис или потерял обновления — отчитываемся по тому, что успели
+        timed_out = True
+    finally:
+        elapsed = time.perf_counter() - started
+        await bot_module.dp.stop_polling()
+        await polling
+        await api.stop()
+
+    result = stats.report(elapsed)
+    result['expected'] = stats.total
+    result['timed_out'] = timed_out
+    result['api_calls'] = api.calls
+    return result
+
+
+def print_report(result):
+    print(f"Обновлений: {result['updates']} из {result['expected']} за {result['elapsed_s']:.2f} с "
+          f"({result['updates_per_sec']:.1f} updates/sec)")
+    print(f"{'тип':<14}{'кол-во':>8}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'max мс':>10}{'SQL/update':>11}")
+    for kind, row in result['by_kind'].items():
+        print(f"{kind:<14}{row['updates']:>8}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+              f"{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}{row['db_calls_per_update']:>11.2f}")
+    print(f"Вызовы Bot API: {result['api_calls']}")
+
+
+def check_thresholds(result, args):
+    """Проверить пороги для CI, возвращает список нарушений"""
+    errors = []
+    overall = result['by_kind']['all']
+
+    if result['timed_out']:
+        errors.append(f"за {args.timeout} с обработано {result['updates']} из {result['expected']} обновлений")
+
+    if args.min_rate is not None and result['updates_per_sec'] < args.min_rate:
+        errors.append(f"updates/sec {result['updates_per_sec']:.1f} < {args.min_rate}")
+    if args.max_p95_ms is not None and overall['p95_ms'] > args.max_p95_ms:
+        errors.append(f"p95 {overall['p95_ms']:.2f} мс > {args.max_p95_ms} мс")
+    if args.max_db_calls is not None:
+        for kind, row in result['by_kind'].items():
+            if row['db_calls_per_update'] > args.max_db_calls:
+                errors.append(f"{kind}: {row['db_calls_per_update']:.2f} SQL-запросов > {args.max_db_calls}")
+
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест bot.py на локальном Bot API')
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--invite-ratio', type=float, default=0.3)
+    parser.add_argument('--web-app-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300, help='максимальное время прогона, с')
+    parser.add_argument('--database-url', default=None,
+                        help='БД для прогона (по умолчанию временный SQLite)')
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    parser.add_argument('--min-rate', type=float, default=None, help='минимум updates/sec')
+    parser.add_argument('--max-p95-ms', type=float, default=None, help='максимум p95, мс')
+    parser.add_argument('--max-db-calls', type=float, default=None, help='максимум SQL-запросов на update')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.database_url:
+            args.database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+        result = asyncio.run(run_benchmark(args))
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+
+    errors = check_thresholds(result, args)
+    for error in errors:
+        print(f"❌ {error}", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
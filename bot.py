@@ -1,6 +1,8 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import Command
 from dotenv import load_dotenv
 import os
@@ -10,11 +12,18 @@ from database_pg import db
 load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
+# Адрес Bot API (для локального сервера или fake_telegram.py при нагрузочных тестах)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 
 # Создаём бота и диспетчер
-bot = Bot(token=BOT_TOKEN)
+if TELEGRAM_API_URL:
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    bot = Bot(token=BOT_TOKEN, session=session)
+else:
+    bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
 
 # URL Mini App
@@ -0,0 +1,105 @@
+import argparse
+import logging
+import os
+import tempfile
+import uuid
+from compact_close_people import compact
+
+# Проверка дедупликации close_people на обоих бэкендах:
+# повторный add_close_person, NULL person_id, сжатие дублей и создание индекса.
+# По умолчанию работает на временных SQLite-базах.
+
+
+def seed_duplicates(execute, owner_id, person_id):
+    """Вставить дубли в обход add_close_person, как до появления индекса"""
+    rows = [
+        # Исходная запись, переименованная владельцем
+        {'name': 'Мама', 'gender': 'f', 'interests': ''},
+        # Повторные приглашения с именем из Telegram
+        {'name': 'Olga', 'gender': '', 'interests': ''},
+        {'name': 'Olga', 'gender': '', 'interests': 'books'},
+    ]
+    for row in rows:
+        execute('''
+            INSERT INTO close_people (owner_id, person_id, name, gender, birthdate, interests)
+            VALUES (:owner_id, :person_id, :name, :gender, '', :interests)
+        ''', dict(row, owner_id=owner_id, person_id=person_id))
+
+
+def check_backend(label, db, execute, drop_index):
+    owner_id = f"check-{uuid.uuid4().hex[:8]}"
+    person_id = '42'
+
+    drop_index()
+    seed_duplicates(execute, owner_id, person_id)
+
+    # Вручную добавленные люди без person_id не конфликтуют друг с другом
+    first = db.add_close_person(owner_id, 'Без Telegram')
+    second = db.add_close_person(owner_id, 'Без Telegram')
+    assert first != second, f"{label}: NULL person_id не должен конфликтовать"
+
+    reclaimed = compact(db, batch_size=1)
+    assert reclaimed == 2, f"{label}: ожидалось 2 удалённых дубля, получено {reclaimed}"
+    assert db.create_person_index(), f"{label}: индекс не создан после сжатия"
+
+    people = [p for p in db.get_close_people(owner_id) if p['person_id'] == person_id]
+    assert len(people) == 1, f"{label}: после сжатия осталось {len(people)} записей"
+    merged = people[0]
+    assert merged['name'] == 'Мама', f"{label}: имя владельца потеряно: {merged['name']!r}"
+    assert merged['gender'] == 'f' and merged['interests'] == 'books', f"{label}: поля не слиты: {merged}"
+
+    # Повторное приглашение возвращает существующую запись
+    again = db.add_close_person(owner_id, 'Olga', person_id=person_id)
+    assert again == merged['id'], f"{label}: повторный add_close_person вернул {again}, а не {merged['id']}"
+    assert again == db.add_close_person(owner_id, 'Olga', person_id=person_id)
+    people = [p for p in db.get_close_people(owner_id) if p['person_id'] == person_id]
+    assert len(people) == 1, f"{label}: повторный add_close_person создал дубль"
+
+    assert compact(db, batch_size=1) == 0, f"{label}: повторное сжатие должно ничего не удалять"
+
+    for person in db.get_close_people(owner_id):
+        db.delete_close_person(person['id'])
+
+    print(f"✅ {label}: ok")
+
+
+def check_sqlite(tmp):
+    from database import Database
+
+    db = Database(os.path.join(tmp, 'check.db'))
+
+    def execute(sql, params):
+        conn = db.get_connection()
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    check_backend('database.py', db, execute,
+                  lambda: execute('DROP INDEX IF EXISTS uq_close_people_owner_person', {}))
+
+
+def check_pg(database_url):
+    # database_pg читает DATABASE_URL при импорте
+    os.environ['DATABASE_URL'] = database_url
+    from sqlalchemy import text
+    from database_pg import db, person_index
+
+    def execute(sql, params):
+        with db.engine.begin() as conn:
+            conn.execute(text(sql), params)
+
+    check_backend('database_pg.py', db, execute,
+                  lambda: person_index.drop(db.engine, checkfirst=True))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Проверка дедупликации близких людей')
+    parser.add_argument('--pg-url', default=None,
+                        help='тестовая БД для database_pg.py (индекс пересоздаётся, не боевая!)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_sqlite(tmp)
+        check_pg(args.pg_url or f"sqlite:///{os.path.join(tmp, 'check_pg.db')}")
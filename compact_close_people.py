@@ -0,0 +1,45 @@
+import argparse
+import logging
+
+# Разовое сжатие close_people: сливает дубли (owner_id, person_id),
+# которые накопились от повторных приглашений, и создаёт уникальный индекс.
+
+# Сколько раз повторить сжатие, если за время прохода появились новые дубли
+MAX_PASSES = 3
+
+
+def compact(db, batch_size):
+    """Сжать таблицу и создать индекс, возвращает число удалённых строк"""
+    reclaimed = 0
+
+    for attempt in range(1, MAX_PASSES + 1):
+        removed = db.compact_close_people(batch_size=batch_size)
+        reclaimed += removed
+        logging.info(f"Проход {attempt}: удалено {removed} дублей")
+
+        if db.create_person_index():
+            logging.info("Уникальный индекс (owner_id, person_id) создан")
+            return reclaimed
+
+    logging.error("Не удалось создать уникальный индекс: дубли продолжают появляться")
+    return reclaimed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Слияние дублей близких людей')
+    parser.add_argument('--backend', choices=['sqlite', 'pg'], default='sqlite',
+                        help='sqlite (database.py) или pg (database_pg.py, DATABASE_URL)')
+    parser.add_argument('--db-path', default='gift_bot.db', help='путь к SQLite базе')
+    parser.add_argument('--batch-size', type=int, default=500, help='групп дублей на транзакцию')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.backend == 'pg':
+        from database_pg import db
+    else:
+        from database import Database
+        db = Database(args.db_path)
+
+    reclaimed = compact(db, args.batch_size)
+    print(f"Освобождено строк: {reclaimed}")
@@ -1,7 +1,15 @@
 import sqlite3
+import logging
 from datetime import datetime
 import json
 
+# Колонки, которые переносятся из дублей при слиянии близких людей
+MERGE_FIELDS = ['name', 'gender', 'birthdate', 'interests', 'age']
+
+# Дубли от повторных приглашений несут имя из Telegram, а переименование
+# владельцем хранится в исходной записи, поэтому для этих полей она главнее
+KEEPER_FIELDS = ['name']
+
 class Database:
     def __init__(self, db_path='gift_bot.db'):
         self.db_path = db_path
@@ -57,6 +65,27 @@ class Database:
         
         conn.commit()
         conn.close()
+        
+        if not self.create_person_index():
+            logging.warning("В close_people есть дубли (owner_id, person_id), "
+                            "запустите compact_close_people.py")
+    
+    def create_person_index(self):
+        """Создать уникальный индекс (owner_id, person_id), False если мешают дубли"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_close_people_owner_person
+                ON close_people (owner_id, person_id)
+            ''')
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+        finally:
+            conn.close()
     
     # === ПОЛЬЗОВАТЕЛИ ===
     
@@ -91,15 +120,35 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO close_people (owner_id, person_id, name, gender, birthdate, interests, age)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (str(owner_id), str(person_id) if person_id else None, name, gender, birthdate, interests, age))
+        # Повторное приглашение не создаёт дубль, а возвращает существующую запись.
+        # Если её удалили между INSERT и SELECT, пробуем вставить ещё раз
+        person_db_id = None
+        for attempt in range(2):
+            cursor.execute('''
+                INSERT INTO close_people (owner_id, person_id, name, gender, birthdate, interests, age)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT DO NOTHING
+            ''', (str(owner_id), str(person_id) if person_id else None, name, gender, birthdate, interests, age))
+            
+            if cursor.rowcount:
+                person_db_id = cursor.lastrowid
+                break
+            
+            cursor.execute('''
+                SELECT id FROM close_people
+                WHERE owner_id = ? AND person_id = ?
+            ''', (str(owner_id), str(person_id)))
+            existing = cursor.fetchone()
+            if existing:
+                person_db_id = existing['id']
+                break
         
-        person_db_id = cursor.lastrowid
         conn.commit()
         conn.close()
         
+        if person_db_id is None:
+            raise RuntimeError(f"Не удалось добавить близкого человека {person_id} для {owner_id}")
+        
         return person_db_id
     
     def get_close_people(self, owner_id):
@@ -164,6 +213,74 @@ class Database:
         conn.commit()
         conn.close()
     
+    def compact_close_people(self, batch_size=500):
+        """
+        Слить дубли близких людей с одинаковым (owner_id, person_id).
+        
+        Остаётся id самой старой записи. Имя остаётся её собственным, остальные
+        поля берутся из самой новой записи, где они не пустые; отброшенные
+        значения пишутся в лог.
+        Каждая пачка из batch_size групп — отдельная короткая транзакция,
+        поэтому приложение может работать во время сжатия.
+        Возвращает число удалённых строк.
+        """
+        reclaimed = 0
+        
+        while True:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT owner_id, person_id FROM close_people
+                WHERE person_id IS NOT NULL
+                GROUP BY owner_id, person_id
+                HAVING COUNT(*) > 1
+                LIMIT ?
+            ''', (batch_size,))
+            groups = cursor.fetchall()
+            
+            if not groups:
+                conn.close()
+                break
+            
+            for group in groups:
+                cursor.execute('''
+                    SELECT * FROM close_people
+                    WHERE owner_id = ? AND person_id = ?
+                    ORDER BY id
+                ''', (group['owner_id'], group['person_id']))
+                rows = [dict(row) for row in cursor.fetchall()]
+                
+                keeper, duplicates = rows[0], rows[1:]
+                updates = {}
+                for field in MERGE_FIELDS:
+                    order = [keeper] + duplicates[::-1] if field in KEEPER_FIELDS else rows[::-1]
+                    values = [row[field] for row in order if row[field] not in (None, '')]
+                    if not values:
+                        continue
+                    
+                    if values[0] != keeper[field]:
+                        updates[field] = values[0]
+                    discarded = [value for value in values[1:] if value != values[0]]
+                    if discarded:
+                        logging.info(f"close_people {keeper['id']}: {field} = {values[0]!r}, "
+                                     f"отброшено {discarded!r}")
+                
+                if updates:
+                    fields = ', '.join(f"{key} = ?" for key in updates)
+                    cursor.execute(f"UPDATE close_people SET {fields} WHERE id = ?",
+                                   list(updates.values()) + [keeper['id']])
+                
+                duplicate_ids = [row['id'] for row in duplicates]
+                placeholders = ','.join('?' * len(duplicate_ids))
+                cursor.execute(f'DELETE FROM close_people WHERE id IN ({placeholders})', duplicate_ids)
+                reclaimed += len(duplicate_ids)
+            
+            conn.commit()
+            conn.close()
+        
+        return reclaimed
+    
     # === ПРИГЛАШЕНИЯ ===
     
     def add_invitation(self, inviter_id, invited_id):
@@ -205,5 +322,13 @@ class Database:
         return dict(invitation) if invitation else None
 
 
-# Создаём экземпляр базы данных
-db = Database()
+# Экземпляр базы данных по умолчанию создаётся при первом обращении,
+# чтобы импорт модуля не создавал gift_bot.db в текущей папке
+_db = None
+
+def get_db():
+    """Получить экземпляр базы данных по умолчанию"""
+    global _db
+    if _db is None:
+        _db = Database()
+    return _db
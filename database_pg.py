@@ -1,5 +1,8 @@
 import os
-from sqlalchemy import create_engine, Column, String, Integer, Text, DateTime
+import logging
+from sqlalchemy import create_engine, Column, String, Integer, Text, DateTime, Index, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -32,6 +35,19 @@ class ClosePerson(Base):
     age = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# Один человек в списке владельца; NULL person_id (добавленные вручную) не конфликтуют
+person_index = Index('uq_close_people_owner_person', ClosePerson.owner_id, ClosePerson.person_id, unique=True)
+
+# Диалекты с INSERT ... ON CONFLICT DO NOTHING, для остальных — обычный ORM
+UPSERT_DIALECTS = {'postgresql': postgresql, 'sqlite': sqlite}
+
+# Колонки, которые переносятся из дублей при слиянии близких людей
+MERGE_FIELDS = ['name', 'gender', 'birthdate', 'interests', 'age']
+
+# Дубли от повторных приглашений несут имя из Telegram, а переименование
+# владельцем хранится в исходной записи, поэтому для этих полей она главнее
+KEEPER_FIELDS = ['name']
+
 class Invitation(Base):
     __tablename__ = 'invitations'
     
@@ -55,6 +71,42 @@ class Database:
         # Создаём сессию
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
+        
+        # create_all не добавляет индекс в уже существующую таблицу
+        if not self.create_person_index():
+            logging.warning("В close_people есть дубли (owner_id, person_id), "
+                            "запустите compact_close_people.py")
+    
+    def create_person_index(self):
+        """Создать уникальный индекс (owner_id, person_id), False если мешают дубли"""
+        if self.engine.dialect.name != 'postgresql':
+            try:
+                person_index.create(self.engine, checkfirst=True)
+                return True
+            except IntegrityError:
+                return False
+        
+        # CONCURRENTLY не блокирует запись в таблицу, но работает только вне транзакции
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            valid = conn.execute(text(
+                "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+            ), {'name': person_index.name}).scalar()
+            if valid:
+                return True
+            
+            # Неудачная попытка оставляет невалидный индекс
+            if valid is not None:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {person_index.name}"))
+            
+            try:
+                conn.execute(text(
+                    f"CREATE UNIQUE INDEX CONCURRENTLY {person_index.name} "
+                    f"ON close_people (owner_id, person_id)"
+                ))
+                return True
+            except IntegrityError:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {person_index.name}"))
+                return False
     
     def add_user(self, user_id, username=None, first_name=None):
         """Добавить пользователя"""
@@ -78,6 +130,17 @@ class Database:
     
     def add_close_person(self, owner_id, name, person_id=None, gender='', birthdate='', interests='', age=None):
         """Добавить близкого человека"""
+        if person_id:
+            if self.engine.dialect.name in UPSERT_DIALECTS:
+                return self._upsert_close_person(owner_id, name, person_id, gender, birthdate, interests, age)
+            
+            existing = self.session.query(ClosePerson.id).filter_by(
+                owner_id=str(owner_id),
+                person_id=str(person_id)
+            ).scalar()
+            if existing:
+                return existing
+        
         person = ClosePerson(
             owner_id=str(owner_id),
             person_id=str(person_id) if person_id else None,
@@ -91,6 +154,42 @@ class Database:
         self.session.commit()
         return person.id
     
+    def _upsert_close_person(self, owner_id, name, person_id, gender, birthdate, interests, age):
+        """Добавить человека с person_id, при повторе вернуть существующую запись"""
+        insert = UPSERT_DIALECTS[self.engine.dialect.name].insert
+        
+        # Если запись удалили между INSERT и SELECT, пробуем вставить ещё раз
+        person_db_id = None
+        for attempt in range(2):
+            stmt = insert(ClosePerson).values(
+                owner_id=str(owner_id),
+                person_id=str(person_id),
+                name=name,
+                gender=gender,
+                birthdate=birthdate,
+                interests=interests,
+                age=age
+            ).on_conflict_do_nothing()
+            
+            result = self.session.execute(stmt)
+            if result.rowcount:
+                person_db_id = result.inserted_primary_key[0]
+                break
+            
+            person_db_id = self.session.query(ClosePerson.id).filter_by(
+                owner_id=str(owner_id),
+                person_id=str(person_id)
+            ).scalar()
+            if person_db_id is not None:
+                break
+        
+        self.session.commit()
+        
+        if person_db_id is None:
+            raise RuntimeError(f"Не удалось добавить близкого человека {person_id} для {owner_id}")
+        
+        return person_db_id
+    
     def get_close_people(self, owner_id):
         """Получить всех близких пользователя"""
         people = self.session.query(ClosePerson).filter_by(owner_id=str(owner_id)).order_by(ClosePerson.created_at.desc()).all()
@@ -128,6 +227,58 @@ class Database:
         self.session.query(ClosePerson).filter(ClosePerson.id.in_(person_db_ids)).delete(synchronize_session=False)
         self.session.commit()
     
+    def compact_close_people(self, batch_size=500):
+        """
+        Слить дубли близких людей с одинаковым (owner_id, person_id).
+        
+        Остаётся id самой старой записи. Имя остаётся её собственным, остальные
+        поля берутся из самой новой записи, где они не пустые; отброшенные
+        значения пишутся в лог.
+        Каждая пачка из batch_size групп — отдельная транзакция с блокировкой
+        только своих строк, таблица остаётся доступной для приложения.
+        Возвращает число удалённых строк.
+        """
+        reclaimed = 0
+        
+        while True:
+            groups = self.session.query(ClosePerson.owner_id, ClosePerson.person_id).filter(
+                ClosePerson.person_id.isnot(None)
+            ).group_by(
+                ClosePerson.owner_id, ClosePerson.person_id
+            ).having(func.count(ClosePerson.id) > 1).limit(batch_size).all()
+            
+            if not groups:
+                break
+            
+            for owner_id, person_id in groups:
+                rows = self.session.query(ClosePerson).filter_by(
+                    owner_id=owner_id,
+                    person_id=person_id
+                ).order_by(ClosePerson.id).with_for_update().all()
+                
+                keeper, duplicates = rows[0], rows[1:]
+                for field in MERGE_FIELDS:
+                    order = [keeper] + duplicates[::-1] if field in KEEPER_FIELDS else rows[::-1]
+                    values = [getattr(row, field) for row in order
+                              if getattr(row, field) not in (None, '')]
+                    if not values:
+                        continue
+                    
+                    setattr(keeper, field, values[0])
+                    discarded = [value for value in values[1:] if value != values[0]]
+                    if discarded:
+                        logging.info(f"close_people {keeper.id}: {field} = {values[0]!r}, "
+                                     f"отброшено {discarded!r}")
+                
+                self.session.query(ClosePerson).filter(
+                    ClosePerson.id.in_([row.id for row in duplicates])
+                ).delete(synchronize_session=False)
+                reclaimed += len(duplicates)
+            
+            self.session.commit()
+        
+        return reclaimed
+    
     def add_invitation(self, inviter_id, invited_id):
         """Добавить приглашение"""
         existing = self.session.query(Invitation).filter_by(
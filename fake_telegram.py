@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from aiohttp import web
+
+# Локальная замена Telegram Bot API для нагрузочного тестирования bot.py.
+# Поддерживает getMe, getUpdates, setWebhook, deleteWebhook и sendMessage,
+# остальные методы просто отвечают {"ok": true, "result": true}.
+
+FAKE_BOT_TOKEN = '123456:FAKE-token-for-local-testing'
+
+
+class FakeTelegramAPI:
+    def __init__(self):
+        self.updates = []
+        self.sent_messages = 0
+        self.webhook_url = ''
+        self.calls = {}
+        self._new_updates = asyncio.Event()
+        self._message_id = 0
+
+        self.app = web.Application()
+        self.app.router.add_route('*', '/bot{token}/{method}', self.handle)
+        self.runner = None
+
+    # === ОЧЕРЕДЬ ОБНОВЛЕНИЙ ===
+
+    def push_updates(self, updates):
+        """Добавить обновления в очередь getUpdates"""
+        self.updates.extend(updates)
+        self._new_updates.set()
+
+    # === HTTP ===
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Запустить сервер, возвращает базовый URL"""
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        """Остановить сервер"""
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        params = dict(await request.post())
+        if not params and request.can_read_body:
+            params = await request.json()
+
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        handler = getattr(self, f"method_{method.lower()}", None)
+        result = await handler(params) if handler else True
+
+        return web.json_response({'ok': True, 'result': result})
+
+    # === МЕТОДЫ BOT API ===
+
+    async def method_getme(self, params):
+        return {
+            'id': 123456,
+            'is_bot': True,
+            'first_name': 'Gift Bot',
+            'username': 'fake_gift_bot'
+        }
+
+    async def method_getupdates(self, params):
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = min(float(params.get('timeout') or 0), 1.0)
+
+        # Telegram считает обновления до offset подтверждёнными
+        if offset:
+            self.updates = [u for u in self.updates if u['update_id'] >= offset]
+
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        return self.updates[:limit]
+
+    async def method_setwebhook(self, params):
+        self.webhook_url = params.get('url', '')
+        return True
+
+    async def method_deletewebhook(self, params):
+        self.webhook_url = ''
+        return True
+
+    async def method_sendmessage(self, params):
+        self.sent_messages += 1
+        self._message_id += 1
+
+        return {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(params['chat_id']), 'type': 'private'},
+            'text': params.get('text', '')
+        }
+
+
+# === ГЕНЕРАТОР ОБНОВЛЕНИЙ ===
+
+def make_message_update(update_id, user_id, text=None, web_app_data=None):
+    """Собрать update с сообщением от пользователя"""
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {
+            'id': user_id,
+            'is_bot': False,
+            'first_name': f"User{user_id}",
+            'username': f"user{user_id}"
+        }
+    }
+
+    if text is not None:
+        message['text'] = text
+        if text.startswith('/'):
+            message['entities'] = [{
+                'type': 'bot_command',
+                'offset': 0,
+                'length': len(text.split()[0])
+            }]
+
+    if web_app_data is not None:
+        message['web_app_data'] = {
+            'data': json.dumps(web_app_data, ensure_ascii=False),
+            'button_text': '🎁 Подобрать подарок'
+        }
+
+    return {'update_id': update_id, 'message': message}
+
+
+def generate_updates(count, users=1000, invite_ratio=0.3, web_app_ratio=0.3, seed=0, start_id=1):
+    """
+    Сгенерировать поток обновлений: /start, /start invite_<id> и web_app_data.
+
+    Пользователи и приглашения повторяются, как при повторном открытии ссылок.
+    """
+    rnd = random.Random(seed)
+    first_user = 100000
+    updates = []
+
+    for i in range(count):
+        update_id = start_id + i
+        user_id = first_user + rnd.randrange(users)
+        roll = rnd.random()
+
+        if roll < invite_ratio:
+            inviter_id = first_user + rnd.randrange(users)
+            update = make_message_update(update_id, user_id, text=f"/start invite_{inviter_id}")
+        elif roll < invite_ratio + web_app_ratio:
+            update = make_message_update(update_id, user_id, web_app_data={
+                'name': f"Person{rnd.randrange(100)}",
+                'event': rnd.choice(['День рождения', 'Новый год', '8 марта']),
+                'budget': str(rnd.randrange(500, 10000, 500))
+            })
+        else:
+            update = make_message_update(update_id, user_id, text='/start')
+
+        updates.append(update)
+
+    return updates
+
+
+async def serve(host, port, count):
+    api = FakeTelegramAPI()
+    url = await api.start(host, port)
+    if count:
+        api.push_updates(generate_updates(count))
+
+    print(f"Fake Bot API: {url} (BOT_TOKEN={FAKE_BOT_TOKEN})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Локальная замена Telegram Bot API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--updates', type=int, default=0, help='сколько обновлений сразу положить в очередь')
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port, args.updates))